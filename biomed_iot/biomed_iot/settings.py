@@ -162,6 +162,28 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Caches
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+# Cache for the users views (measurement names, MQTT topic ids, Node-RED status, rendered pages).
+# File based so that all gunicorn workers share it and a cache.delete() in one worker is seen by all
+# (a per-process LocMemCache would keep serving stale entries in the other workers).
+# MAX_ENTRIES bounds its size; when full, a third of the entries is culled.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'django_cache',
+        'OPTIONS': {
+            'MAX_ENTRIES': 2048,
+        },
+    },
+}
+
+# Pooled InfluxDB clients kept by users.services.influx_utils (one per bucket token):
+# maximum number of clients and seconds an unused client is kept before it is closed
+INFLUX_CLIENT_CACHE_MAXSIZE = 512
+INFLUX_CLIENT_CACHE_TTL = 600
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/4.2/topics/i18n/
 
@@ -7,6 +7,11 @@ import logging
 logger = logging.getLogger(__name__)
 logger.debug('In backends.py (Username-/EmailAuthBackend)')
 
+# One-to-one user data read by most views; joined when request.user is loaded to avoid extra lazy queries.
+# Only read-only data belongs here: nodereduserdata is saved through request.user during a request,
+# so a snapshot joined before the view runs could overwrite fresher changes (e.g. the container port).
+USER_RELATED_DATA = ('influxuserdata',)
+
 
 class UsernameAuthBackend(ModelBackend):
     """
@@ -36,7 +41,7 @@ class UsernameAuthBackend(ModelBackend):
         Overrides the get_user method
         """
         try:
-            return CustomUser.objects.get(pk=user_id)
+            return CustomUser.objects.select_related(*USER_RELATED_DATA).get(pk=user_id)
         except CustomUser.DoesNotExist:
             logger.debug('User does not exist for user_id: %s', user_id)
             return None
@@ -67,7 +72,7 @@ class EmailAuthBackend(ModelBackend):
         Overrides the get_user method
         """
         try:
-            return CustomUser.objects.get(pk=user_id)
+            return CustomUser.objects.select_related(*USER_RELATED_DATA).get(pk=user_id)
         except CustomUser.DoesNotExist:
             return None
 
@@ -98,6 +103,6 @@ class EmailAuthAndVerifiedBackend(ModelBackend):
         Overrides the get_user method
         """
         try:
-            return CustomUser.objects.get(pk=user_id)
+            return CustomUser.objects.select_related(*USER_RELATED_DATA).get(pk=user_id)
         except CustomUser.DoesNotExist:
             return None
@@ -1,4 +1,3 @@
-import re
 from django import forms
 from datetime import datetime, timedelta
 # from django.utils import timezone
@@ -75,17 +74,16 @@ class DeleteDataForm(forms.Form):
         if not tags_string:
             return {}
 
-        # Regex to match 'key=value' where key and value cannot be empty
-        tag_pattern = re.compile(r'^\s*([^=\s]+)\s*=\s*([^=\s]+)\s*$')
         tags_dict = {}
         tag_pairs = tags_string.split(',')
 
         for pair in tag_pairs:
-            match = tag_pattern.match(pair)
-            if not match:
+            # Split 'key=value'; key and value cannot be empty or contain whitespace or a further '='
+            key, sep, value = pair.partition('=')
+            key, value = key.strip(), value.strip()
+            if not sep or not key or not value or '=' in value or any(c.isspace() for c in key + value):
                 raise forms.ValidationError(f"Tag format error in '{pair}'. Ensure format is 'key=value' "
                                             "with no empty key or value.")
-            key, value = match.groups()
             tags_dict[key] = value
 
         return tags_dict
@@ -1,16 +1,20 @@
 import os
 import json
+import functools
 
 # Get the directory of the current file (code_loader.py)
 current_dir = os.path.dirname(os.path.abspath(__file__))
 
 
+# The example files only change on redeploy (which restarts the workers), so load them once per process
+@functools.lru_cache(maxsize=1)
 def load_code_examples():
 	dir_name = 'code_examples'
 	config_file_name = 'code_examples.json'
 	return load_code(dir_name, config_file_name)
 
 
+@functools.lru_cache(maxsize=1)
 def load_nodered_flow_examples():
 	dir_name = 'nodered_flow_examples'
 	config_file_name = 'nodered_flow_examples.json'
@@ -1,6 +1,11 @@
 import json
+import time
+import atexit
+import threading
+from collections import OrderedDict
 import requests  # For HTTP requests to the v1 compatibility endpoint
 import logging
+from django.conf import settings
 import users.models as user_models
 from biomed_iot.config_loader import config
 from influxdb_client import InfluxDBClient, Point
@@ -13,6 +18,59 @@ logger = logging.getLogger(__name__)
 INFLUX_ALL_ACCESS_TOKEN = config.influxdb.INFLUX_ALL_ACCESS_TOKEN
 
 
+class InfluxClientCache:
+    """
+    Bounded cache of InfluxDBClients, one per (url, token, org), so views reuse a client's connection pool.
+
+    Holds at most `maxsize` clients. A client unused for `ttl` seconds expires and, like clients evicted
+    for space, is closed. Since every access renews the ttl, least recently used also means first to expire.
+    """
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clients = OrderedDict()  # (url, token, org_id) -> (client, expires), least recently used first
+        self._lock = threading.Lock()
+
+    def get(self, url, token, org_id):
+        """Returns the cached client for the given credentials, creating it if needed."""
+        key = (url, token, org_id)
+        now = time.monotonic()
+        evicted = []
+        with self._lock:
+            entry = self._clients.pop(key, None)
+            if entry is None or entry[1] <= now:
+                if entry is not None:
+                    evicted.append(entry[0])
+                client = InfluxDBClient(url=url, token=token, org=org_id, enable_gzip=True)
+            else:
+                client = entry[0]
+            self._clients[key] = (client, now + self.ttl)
+
+            while self._clients:
+                oldest_client, expires = next(iter(self._clients.values()))
+                if len(self._clients) <= self.maxsize and expires > now:
+                    break
+                self._clients.popitem(last=False)
+                evicted.append(oldest_client)
+
+        for evicted_client in evicted:
+            evicted_client.close()
+        return client
+
+    def close_all(self):
+        """Closes and removes all cached clients."""
+        with self._lock:
+            clients = [client for client, _ in self._clients.values()]
+            self._clients.clear()
+        for client in clients:
+            client.close()
+
+
+influx_client_cache = InfluxClientCache(settings.INFLUX_CLIENT_CACHE_MAXSIZE, settings.INFLUX_CLIENT_CACHE_TTL)
+atexit.register(influx_client_cache.close_all)
+
+
 class InfluxUserManager:
     """
     Manages InfluxDB resources (buckets and tokens) for a user.
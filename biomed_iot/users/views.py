@@ -1,15 +1,19 @@
 import os
+from itertools import chain
+from operator import attrgetter, itemgetter
 # import jwt  # TODO: for auto-login into Node-RED
 from datetime import datetime
-import requests
 import secrets
 import json
 import logging
 import mimetypes
-from influxdb_client import InfluxDBClient
+from influxdb_client.rest import ApiException
 from django.contrib.auth.decorators import login_required
 from django.utils.decorators import method_decorator
+from django.views.decorators.cache import cache_control, cache_page
+from django.views.decorators.vary import vary_on_cookie
 from django.core.exceptions import ObjectDoesNotExist
+from django.core.cache import cache
 from django.contrib.auth import login
 from django.shortcuts import render, redirect
 from django.contrib import messages
@@ -20,6 +24,7 @@ from .models import NodeRedUserData, CustomUser, Profile  # noqa: F401
 from .forms import UserRegisterForm, UserUpdateForm, UserLoginForm, MqttClientForm, DeleteDataForm
 from .services.mosquitto_utils import MqttMetaDataManager, MqttClientManager, RoleType
 from .services.nodered_utils import NoderedContainer, update_nodered_nginx_conf
+from .services.influx_utils import influx_client_cache
 from .services.code_loader import load_code_examples, load_nodered_flow_examples
 from .services.email_templates import registration_confirmation_email
 from biomed_iot.config_loader import config
@@ -36,6 +41,13 @@ from django.conf import settings
 
 logger = logging.getLogger(__name__)
 
+TOPIC_ID_CACHE_TIMEOUT = 3600  # seconds; a user's MQTT topic id is immutable
+MEASUREMENTS_CACHE_TIMEOUT = 60  # seconds a user's list of measurement names is cached for manage_data
+NODERED_STATUS_CACHE_TIMEOUT = 2  # seconds; bounds staleness of the polled Node-RED container state
+# Rendered pages that do not change per request, cached server-side per session cookie;
+# browsers get private, max-age=0 so nothing is shown from their cache after logout
+STATIC_PAGE_CACHE_TIMEOUT = 60 * 5
+
 
 def send_verification_email(user, request):
     # To be called right after creating the user instance in the registration logic
@@ -168,6 +180,9 @@ common_timezones = {
     'New York': 'America/New_York',
 }
 timezones = [('New York', 'America/New_York'), ('London', 'Europe/London')]
+# The dictionary as a list of tuples sorted by city name
+_TIMEZONES_LIST = sorted(common_timezones.items(), key=lambda x: x[0])
+
 
 # FIXME: Experimental function to determine user time zone
 @login_required
@@ -176,14 +191,21 @@ def set_timezone(request):
         request.session['django_timezone'] = request.POST['timezone']
         return redirect('/')
     else:
-        # Convert the dictionary to a list of tuples and sort by city name
-        timezones_list = sorted(common_timezones.items(), key=lambda x: x[0])
-
         page_title = 'Register'
-        context = {'timezones': timezones_list, 'title': page_title, 'thin_navbar': False}
+        context = {'timezones': _TIMEZONES_LIST, 'title': page_title, 'thin_navbar': False}
         return render(request, 'set_timezone.html', context)
 
 
+def _get_topic_id(user):
+    '''Returns the user's MQTT topic id; cached since it never changes once created'''
+    cache_key = f'mqtt:topic_id:{user.id}'
+    topic_id = cache.get(cache_key)
+    if topic_id is None:
+        topic_id = MqttMetaDataManager(user).metadata.user_topic_id
+        cache.set(cache_key, topic_id, TOPIC_ID_CACHE_TIMEOUT)
+    return topic_id
+
+
 @login_required
 def devices(request):
     """
@@ -191,19 +213,15 @@ def devices(request):
     although theoretically, one could use more than one client on one device.
     For technical correctness, the term client is used here.
     """
-    print('in "devices view"')
     mqtt_client_manager = MqttClientManager(request.user)
 
     if request.method == 'POST':
         new_device_form = MqttClientForm(request.POST)
         if request.POST.get('action') == 'create':
-            print('in "create"')
             if new_device_form.is_valid():
-                print('form is valid')
                 new_textname = new_device_form.cleaned_data['textname']
-                print(f'New Textname from form = {new_textname}')
+                logger.debug('Creating device with textname: %s', new_textname)
                 mqtt_client_manager.create_client(textname=new_textname, role_type=RoleType.DEVICE.value)
-                print('after create client')
                 messages.success(request, f'Device with name "{new_textname}" successfully created.')
                 return redirect('devices')
             else:
@@ -216,9 +234,8 @@ def devices(request):
 
         elif request.POST.get('device_username'):
             client_username = request.POST.get('device_username')
-            print(f'delete device ({client_username}) case')
+            logger.debug('Deleting device: %s', client_username)
             success = mqtt_client_manager.delete_client(client_username)
-            print(success)
             if success:
                 messages.success(
                     request,
@@ -229,8 +246,10 @@ def devices(request):
                 messages.error(request, 'Failed to delete the device. Please try again.')
                 return redirect('devices')
 
-    mqtt_meta_data_manager = MqttMetaDataManager(request.user)
-    topic_id = mqtt_meta_data_manager.metadata.user_topic_id
+        # Every POST (incl. unhandled actions like 'modify') ends here without fetching the page data
+        return redirect('devices')
+
+    topic_id = _get_topic_id(request.user)
     in_topic = f'in/{topic_id}/your/subtopic'
     out_topic = f'out/{topic_id}/your/subtopic'
 
@@ -250,32 +269,36 @@ def devices(request):
     return render(request, 'users/devices.html', context)
 
 
-@login_required
-def message_and_topic_structure(request):
-    mqtt_meta_data_manager = MqttMetaDataManager(request.user)
-    topic_id = mqtt_meta_data_manager.metadata.user_topic_id
-    in_topic = f'in/{topic_id}/your/subtopic'
-    out_topic = f'out/{topic_id}/your/subtopic'
-
-    message_example = {
+# Static example payloads shown on the message & topic structure page, serialized once at import
+_MESSAGE_EXAMPLE_JSON = json.dumps(
+    {
         'temperature': 25.3,
         'timestamp': 1713341175,
-    }
-    message_example_large = {
+    },
+    indent=4,
+)
+_MESSAGE_EXAMPLE_LARGE_JSON = json.dumps(
+    {
         'temperature': 25.3,
         'humidity': 50,
         'sensorX': 'text value',
         '...': '...',
         'timestamp': 1713341175,
-    }
+    },
+    indent=4,
+)
 
-    message_example_json = json.dumps(message_example, indent=4)
-    message_example_large_json = json.dumps(message_example_large, indent=4)
+
+@login_required
+def message_and_topic_structure(request):
+    topic_id = _get_topic_id(request.user)
+    in_topic = f'in/{topic_id}/your/subtopic'
+    out_topic = f'out/{topic_id}/your/subtopic'
 
     current_server_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     context = {
-        'message_example': message_example_json,
-        'message_example_large': message_example_large_json,
+        'message_example': _MESSAGE_EXAMPLE_JSON,
+        'message_example_large': _MESSAGE_EXAMPLE_LARGE_JSON,
         'in_topic': in_topic,
         'out_topic': out_topic,
         'topic_id': topic_id,
@@ -287,6 +310,9 @@ def message_and_topic_structure(request):
 
 
 @login_required
+@cache_control(private=True, max_age=0)
+@cache_page(STATIC_PAGE_CACHE_TIMEOUT)
+@vary_on_cookie
 def code_examples(request):
     examples_content = load_code_examples()
 
@@ -348,18 +374,21 @@ def restricted_download(request, filename):
 
 def get_or_create_nodered_user_data(request):
     '''A helper function to get NodeRedUserData  for current user or create new if no data is there'''
-    with transaction.atomic():
-        try:
-            nodered_data, created = NodeRedUserData.objects.get_or_create(
+    # Fast path for existing users: no container name generation or token creation needed
+    try:
+        return NodeRedUserData.objects.get(user=request.user)
+    except NodeRedUserData.DoesNotExist:
+        pass
+
+    try:
+        with transaction.atomic():
+            return NodeRedUserData.objects.create(
                 user=request.user,
-                defaults={
-                    'container_name': NodeRedUserData.generate_unique_container_name(),
-                    'access_token': secrets.token_urlsafe(50),
-                },
+                container_name=NodeRedUserData.generate_unique_container_name(),
+                access_token=secrets.token_urlsafe(50),
             )
-        except IntegrityError:
-            pass
-    return nodered_data
+    except IntegrityError:  # created by a concurrent request in the meantime
+        return NodeRedUserData.objects.get(user=request.user)
 
 
 @login_required
@@ -491,13 +520,15 @@ def nodered_open(request):
     mqtt_client_manager = MqttClientManager(request.user)
     nodered_mqtt_client_data = mqtt_client_manager.get_nodered_client()
 
+    nodered_user_data = request.user.nodereduserdata
+
     page_title = 'Node-RED Automation - Connect Devices, Control & Save Data'
     context = {
         'title': page_title,
         'nodered_mqtt_client_data': nodered_mqtt_client_data,
         'influxdb_token': request.user.influxuserdata.bucket_token,
-        'username': request.user.nodereduserdata.username,
-        'password': request.user.nodereduserdata.password,
+        'username': nodered_user_data.username,
+        'password': nodered_user_data.password,
         'thin_navbar': False,
     }
     return render(request, 'users/nodered_open.html', context)
@@ -564,22 +595,23 @@ def nodered_dashboard(request):
 def update_nodered_data_container_port(nodered_data, nodered_container):
     ''' A helper function to update nodered container port in NodeRedUserData model '''
     with transaction.atomic():  # protection against race condition
-        # Identify and lock the conflicting row
-        conflicting_users = (
+        # Lock the conflicting rows and release their port in a single UPDATE
+        # Set to None and not for example "" to avoid UNIQUE constraint failure
+        (
             NodeRedUserData.objects.select_for_update()
             .exclude(user=nodered_data.user)
             .filter(container_port=nodered_container.port)
+            .update(container_port=None)
         )
 
-        for user_data in conflicting_users:
-            user_data.container_port = None  # Set to None and not for example "" to avoid UNIQUE constraint failure
-            user_data.save()
-
         nodered_data.container_port = nodered_container.port
-        nodered_data.save()
+        nodered_data.save(update_fields=['container_port'])
 
 
 @login_required
+@cache_control(private=True, max_age=0)
+@cache_page(STATIC_PAGE_CACHE_TIMEOUT)
+@vary_on_cookie
 def nodered_flow_examples(request):
     nodered_flow_examples = load_nodered_flow_examples()
 
@@ -595,15 +627,17 @@ def nodered_flow_examples(request):
 @login_required
 def nodered_status_check(request):
     """Called by JS function checkNoderedStatus() in nodered_manager.html"""
-    print('nodered_status_check: Started handling request')
     # Attempt to retrieve the container name from the session.
     container_name = request.session.get('container_name')
-    print('after session.get')
     if not container_name:
-        print('No container name')
+        logger.debug('nodered_status_check: no container name in session')
         return redirect('nodered-manager')
-    status = NoderedContainer.check_container_state_by_name(container_name)
-    print('nodered_status_check: Finished handling request')
+    # Share one Docker lookup per container between pollers within the TTL
+    cache_key = f'nodered:status:{container_name}'
+    status = cache.get(cache_key)
+    if status is None:
+        status = NoderedContainer.check_container_state_by_name(container_name)
+        cache.set(cache_key, status, NODERED_STATUS_CACHE_TIMEOUT)
     return JsonResponse({'status': status})
 
 
@@ -638,30 +672,46 @@ def access_nodered(request):
     # return response
 
 
+# Getters to read the "_value" of each Flux record without per-row bytecode
+_get_values = attrgetter('values')
+_get_value = itemgetter('_value')
+
+# Flux query for all distinct measurement names in a bucket (%s: bucket name)
+_FLUX_MEASUREMENTS_QUERY = '''
+from(bucket: "%s")
+|> range(start: 1970-01-01T00:00:00Z)
+|> keep(columns: ["_measurement"])
+|> distinct(column: "_measurement")
+'''
+
+
 @login_required
 def manage_data(request):
+    influx_data = request.user.influxuserdata
+    measurements_cache_key = f'influx:meas:{request.user.id}'
+
     def get_measurements():
-        bucket_name = request.user.influxuserdata.bucket_name
+        # Serve the measurement names from the cache to skip the full-range Flux scan on every render
+        cached_measurements = cache.get(measurements_cache_key)
+        if cached_measurements is not None:
+            return cached_measurements
+
+        bucket_name = influx_data.bucket_name
         url = f"http://{config.influxdb.INFLUX_HOST}:{config.influxdb.INFLUX_PORT}"
-        token = request.user.influxuserdata.bucket_token
+        token = influx_data.bucket_token
         org_id = config.influxdb.INFLUX_ORG_ID
 
-        # Create a client and query to fetch measurements
-        client = InfluxDBClient(url=url, token=token, org=org_id)
+        # Get the (cached) client and query to fetch measurements
+        client = influx_client_cache.get(url, token, org_id)
         query_api = client.query_api()
-        query = f'''
-        from(bucket: "{bucket_name}")
-        |> range(start: 1970-01-01T00:00:00Z)
-        |> keep(columns: ["_measurement"])
-        |> distinct(column: "_measurement")
-        '''
+        query = _FLUX_MEASUREMENTS_QUERY % bucket_name
 
         result = query_api.query(query=query)
 
         # Flatten output tables into list of measurements
-        measurements = [row.values["_value"] for table in result for row in table]
+        measurements = list(map(_get_value, map(_get_values, chain.from_iterable(result))))
 
-        client.close()
+        cache.set(measurements_cache_key, measurements, MEASUREMENTS_CACHE_TIMEOUT)
         return measurements
 
     if request.method == 'POST':
@@ -673,33 +723,25 @@ def manage_data(request):
             end_time = form.cleaned_data["end_time"]
 
             # Build the predicate string based on tags
-            tags_predicate = " AND ".join([f'{key}="{value}"' for key, value in tags.items()])
             predicate = f'_measurement="{measurement}"'
             if tags:
-                predicate += f" AND {tags_predicate}"
-
-            # Prepare data for the delete request
-            delete_data = {
-                'start': start_time,
-                'stop': end_time,
-                'predicate': predicate
-            }
+                predicate += " AND " + " AND ".join(f'{key}="{value}"' for key, value in tags.items())
 
-            # Configure the request to InfluxDB
+            # Reuse the cached client (and its pooled connection) of the measurements query
             url = f"http://{config.influxdb.INFLUX_HOST}:{config.influxdb.INFLUX_PORT}"
             org_id = config.influxdb.INFLUX_ORG_ID
-            bucket_name = request.user.influxuserdata.bucket_name
-            bucket_token = request.user.influxuserdata.bucket_token
-            delete_url = f'{url}/api/v2/delete?org={org_id}&bucket={bucket_name}'
-            delete_headers = {'Authorization': f'Token {bucket_token}', 'Content-Type': 'application/json'}
+            bucket_name = influx_data.bucket_name
+            bucket_token = influx_data.bucket_token
+            client = influx_client_cache.get(url, bucket_token, org_id)
 
             # Execute the delete request
-            response = requests.post(delete_url, headers=delete_headers, json=delete_data)
-            if response.status_code == 204:
+            try:
+                client.delete_api().delete(start_time, end_time, predicate, bucket=bucket_name, org=org_id)
+                cache.delete(measurements_cache_key)  # a delete may remove whole measurements
                 messages.success(request, 'Delete command completed successfully. Any existing data matching your '
                                  + 'criteria has been removed.')
-            else:
-                messages.error(request, f'Failed to delete data: {response.text}')
+            except ApiException as e:
+                messages.error(request, f'Failed to delete data: {e.body}')
             return redirect('manage-data')
     else:
         form = DeleteDataForm(get_measurements())
@@ -713,6 +755,9 @@ def manage_data(request):
 
 
 @login_required
+@cache_control(private=True, max_age=0)
+@cache_page(STATIC_PAGE_CACHE_TIMEOUT)
+@vary_on_cookie
 def visualize(request):
     page_title = 'Visualize Data with Grafana'
     context = {'title': page_title, 'thin_navbar': True}
@@ -19,26 +19,35 @@ import os
 import sys
 import socket
 import platform
-import re
+import secrets
+import string
 import time
 import zipfile
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from getpass import getpass
 from setup_files.setup_utils import (
-    run_bash,
     get_linux_user,
     get_setup_dir,
     log,
     set_setup_dir_rights,
-    get_random_string,
     get_conf_path
 )
-from setup_files.write_config_file import generate_empty_config_data, write_config_file
+from setup_files.write_config_file import write_config_file
+from setup_files import (
+    install_01_basic_apt_packages,
+    install_02_security_packages,
+    install_03_docker,
+    install_06_grafana,
+    install_07_mosquitto,
+    install_08_postgres,
+    install_11_nginx,
+)
 from setup_files.install_01_basic_apt_packages import install_basic_apt_packages
 from setup_files.install_02_security_packages import install_security_packages
 from setup_files.install_03_docker import install_docker
 from setup_files.install_04_nodered import install_nodered
 from setup_files.install_05_influxdb import install_influxdb
-from setup_files.install_06_grafana import install_grafana
+from setup_files.install_06_grafana import install_grafana, download_grafana_deb
 from setup_files.install_07_mosquitto import install_mosquitto
 from setup_files.install_08_postgres import install_postgres
 from setup_files.install_09_django import install_django
@@ -46,8 +55,7 @@ from setup_files.install_10_gunicorn import install_gunicorn
 from setup_files.install_11_nginx import install_nginx
 
 
-def print_logo_header():
-    logo_header = """
+LOGO_HEADER = """
  ______   _                           _    _      _______
 (____  \ (_)                         | |  | |    (_______)
  ____)  ) _   ___   ____   _____   __| |  | |  ___   _
@@ -58,8 +66,47 @@ def print_logo_header():
 <<<----      Setup of Biomed IoT      --->>>
 <<<----       Version v1.0        --->>>
 """
-    print('\n' + logo_header + '\n')
-    log(logo_header + '\n')
+_LOGO_BLOCK = '\n' + LOGO_HEADER + '\n'
+
+
+def print_logo_header():
+    print(_LOGO_BLOCK)
+    log(LOGO_HEADER + '\n')
+
+
+def collect_apt_deps():
+    """Collect the APT_DEPS of all installer modules (without duplicates) to install them in one apt transaction."""
+    installer_modules = [
+        install_01_basic_apt_packages,
+        install_02_security_packages,
+        install_03_docker,
+        install_06_grafana,
+        install_07_mosquitto,
+        install_08_postgres,
+        install_11_nginx,
+    ]
+    apt_deps = []
+    for installer_module in installer_modules:
+        apt_deps.extend(installer_module.APT_DEPS)
+    return list(dict.fromkeys(apt_deps))
+
+
+def get_ip_address(hostname):
+    """
+    Return the IPv4 address of the interface used for outgoing traffic (what `hostname -I` lists first),
+    without forking hostname and awk. Falls back to the addresses the hostname resolves to.
+    """
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as probe_socket:
+        try:
+            probe_socket.connect(('10.255.255.255', 1))  # Connecting a UDP socket sends nothing, it only picks a route
+            return probe_socket.getsockname()[0]
+        except OSError:
+            pass
+    try:
+        host_ips = socket.gethostbyname_ex(hostname)[2]
+    except OSError:
+        host_ips = []
+    return next((ip for ip in host_ips if not ip.startswith('127.')), '127.0.0.1')
 
 
 def get_and_check_cpu_architecture():
@@ -146,6 +193,22 @@ def get_confirmed_text_input(input_prompt, hidden_input=False):
             print('Your inputs do not match. Please try again.')
 
 
+_PASSWORD_SPECIAL_CHARS = frozenset('!@#$%&*()_+-=[]{}|;:\'"<>,.?/')
+_PASSWORD_CHAR_CLASSES = {'upper', 'lower', 'digit', 'special'}
+
+
+def _password_char_class(char):
+    if char in string.ascii_uppercase:
+        return 'upper'
+    if char in string.ascii_lowercase:
+        return 'lower'
+    if char in string.digits:
+        return 'digit'
+    if char in _PASSWORD_SPECIAL_CHARS:
+        return 'special'
+    return None
+
+
 def prompt_for_password(required_length=12):
     # unused
     """
@@ -154,18 +217,6 @@ def prompt_for_password(required_length=12):
     Returns:
     - str: The user-provided password that meets the criteria.
     """
-    password_pattern = re.compile(
-        r"""
-    (?=.*[A-Z])     # at least one uppercase letter
-    (?=.*[a-z])     # at least one lowercase letter
-    (?=.*\d)        # at least one digit
-    (?=.*[!@#$%%&*()_+\-=\[\]{}|;:'"<>,.?/]) # at least one special character
-    .{%d,}          # at least required_length characters
-    """
-        % required_length,
-        re.VERBOSE,
-    )
-
     while True:
         password = get_confirmed_text_input(
             'Enter and remember a safe '
@@ -175,7 +226,7 @@ def prompt_for_password(required_length=12):
             '!@#$%&*()_+-=[]}{|;:<>/?,',
             hidden_input=True,
         )
-        if password_pattern.match(password):
+        if len(password) >= required_length and _PASSWORD_CHAR_CLASSES <= set(map(_password_char_class, password)):
             return password
         else:
             print('Password does not meet the criteria.\n')
@@ -263,6 +314,42 @@ def create_gateway_setup_zip_file(config_path):
     log(f"Created zip file: {zip_file_path}")
 
 
+def run_installation_steps(steps, max_workers=4):
+    """
+    Runs independent installation steps in parallel to overlap their download and install time.
+
+    `steps` maps a step name to a tuple (install_function, names_of_required_steps, done_message).
+    A step is started as soon as all its required steps are done. Apt and dpkg commands are still
+    serialized by run_bash. Returns the merged config data dicts returned by the install functions.
+    """
+    config_data = {}
+    pending = dict(steps)
+    running = {}
+    done = set()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while pending or running:
+            for name, (install_function, required_steps, _) in list(pending.items()):
+                if done.issuperset(required_steps):
+                    running[executor.submit(install_function)] = name
+                    del pending[name]
+            if not running:
+                raise ValueError(f'Installation steps with unresolvable dependencies: {list(pending)}')
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                step_config_data = future.result()  # Re-raises an exception of the install function
+                if step_config_data:
+                    config_data.update(step_config_data)
+                done.add(name)
+                msg = steps[name][2]
+                print(msg)
+                log(msg)
+
+    return config_data
+
+
 def main():
     """
     Content:
@@ -274,11 +361,11 @@ def main():
     """
 
     hostname = socket.gethostname()
-    ip_address = run_bash("hostname --all-ip-addresses | awk '{print $1}'", show_output=False)
+    ip_address = get_ip_address(hostname)
     linux_user = get_linux_user()
     setup_dir = get_setup_dir()
-    django_admin_name = 'admin'
-    django_admin_pass = get_random_string(7) + '-' + get_random_string(7) + '-' + get_random_string(7)
+    django_admin_name = 'admin-' + secrets.token_hex(3)
+    django_admin_pass = 'Dj4-' + secrets.token_urlsafe(12)
     pwreset_email = None
     pwreset_pass = None
     domain = ''
@@ -354,6 +441,11 @@ def main():
     create_tmp_dir()
     create_config_dir()
 
+    # Fetch the large Grafana package in the background while the other components are installed
+    prefetch_executor = ThreadPoolExecutor(max_workers=1)
+    grafana_deb_future = prefetch_executor.submit(download_grafana_deb, architecture)
+    prefetch_executor.shutdown(wait=False)
+
     host_config_data = {
         'IP': ip_address,
         'HOSTNAME': hostname,
@@ -361,10 +453,18 @@ def main():
         'TLS': "true" if setup_scheme != 'NO_TLS' else "false"
     }
 
-    empty_config_data = generate_empty_config_data()
-    write_config_file(empty_config_data)
-
-    install_basic_apt_packages()
+    if not install_basic_apt_packages(collect_apt_deps()):
+        msg = (
+            '\nInstalling the required apt packages failed, so the following installers cannot work. '
+            'See the apt error above or setup_logs/install_01_basic_apt_packages.log, fix the problem '
+            "(e.g. run 'sudo apt update') and run the setup again.\nExiting setup"
+        )
+        print(msg)
+        log(msg)
+        # Exit without waiting for the Grafana prefetch thread to finish its download.
+        # log() writes are line-buffered, so the logs are already complete on disk.
+        sys.stdout.flush()
+        os._exit(1)
     print('Basic apt packages installed')
     log('Basic apt packages installed')
 
@@ -372,47 +472,35 @@ def main():
     print('Security Packages installed')
     log('Security Packages installed')
 
-    install_docker()
-    print('Docker installed')
-    log('Docker installed')
-
-    nodered_config_data = install_nodered(setup_scheme)
-    print('Node-RED installed')
-    log('Node-RED installed')
-
-    influxdb_config_data = install_influxdb(architecture)
-    print('InfluxDB installed')
-    log('InfluxDB installed')
-
-    grafana_config_data = install_grafana(
-        architecture,
-        setup_scheme,
-        ip_address,
-        domain,
-        django_admin_email,
-        django_admin_name,
-        django_admin_pass
-        )
-    print('Grafana installed')
-    log('Grafana installed')
-
-    mosquitto_config_data = install_mosquitto(setup_scheme)
-    print('Mosquitto Broker installed')
-    log('Mosquitto Broker installed')
-
-    postgres_config_data = install_postgres()
-    print('')
-    log('PostgreSQL database installed')
+    # Mosquitto listens on the docker network and its service requires docker.service
+    installation_steps = {
+        'docker': (install_docker, [], 'Docker installed'),
+        'nodered': (lambda: install_nodered(setup_scheme), ['docker'], 'Node-RED installed'),
+        'influxdb': (lambda: install_influxdb(architecture), [], 'InfluxDB installed'),
+        'grafana': (
+            lambda: install_grafana(
+                architecture,
+                setup_scheme,
+                ip_address,
+                domain,
+                django_admin_email,
+                django_admin_name,
+                django_admin_pass,
+                deb_future=grafana_deb_future,
+            ),
+            ['influxdb'],
+            'Grafana installed',
+        ),
+        'mosquitto': (lambda: install_mosquitto(setup_scheme), ['docker'], 'Mosquitto Broker installed'),
+        'postgres': (install_postgres, [], 'PostgreSQL database installed'),
+    }
+    services_config_data = run_installation_steps(installation_steps)
 
     # Write current known config data to config.toml; essential for django setup
     current_config_data = {
         **host_config_data,
         **email_config,
-        **nodered_config_data,
-        **influxdb_config_data,
-        **grafana_config_data,
-        **mosquitto_config_data,
-        **postgres_config_data,
+        **services_config_data,
     }
     write_config_file(current_config_data)
 
@@ -445,11 +533,7 @@ def main():
     all_config_data = {
         **host_config_data,
         **email_config,
-        **nodered_config_data,
-        **influxdb_config_data,
-        **grafana_config_data,
-        **mosquitto_config_data,
-        **postgres_config_data,
+        **services_config_data,
         **django_config_data,
     }
 
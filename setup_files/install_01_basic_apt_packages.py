@@ -1,19 +1,38 @@
-from .setup_utils import run_bash, log
+import subprocess
+from .setup_utils import run_bash, run_argv, log
 
 APT_INSTALL_LOG_FILE_NAME = 'install_01_basic_apt_packages.log'
 
+APT_DEPS = [
+	'python3-pip', 'python3-venv', 'python3-dev',
+	# adduser is requirement of PostgreSQL
+	'curl', 'wget', 'inotify-tools', 'zip', 'adduser', 'git',
+	# libfontconfig1 is requirement of Grafana
+	'libopenjp2-7', 'libtiff6', 'libfontconfig1',
+]
 
-def install_basic_apt_packages():
-	commands = [
-		'apt update',
-		'apt install -y python3-pip python3-venv python3-dev',
-		# adduser is requirement of PostgreSQL
-		'apt install -y curl wget inotify-tools zip adduser git',
-		# libfontconfig1 is requirement of Grafana
-		'apt install -y libopenjp2-7 libtiff6 libfontconfig1',
-	]
-	for command in commands:
-		output = run_bash(command)
-		log(output, APT_INSTALL_LOG_FILE_NAME)
+
+def install_basic_apt_packages(apt_deps=APT_DEPS):
+	"""
+	Installs the given apt packages in a single apt transaction (one dpkg run and trigger pass).
+	setup.py passes the APT_DEPS collected from all installer modules.
+	Returns False if the transaction failed: then none of the packages are installed,
+	as apt aborts the whole transaction if a single package cannot be installed.
+	"""
+	output = run_bash('apt-get update')
+	log(output, APT_INSTALL_LOG_FILE_NAME)
+
+	print(f'Installing {len(apt_deps)} apt packages. This can take several minutes...')
+	try:
+		result = run_argv(['apt-get', 'install', '-y', *apt_deps], capture=True)
+		log(result.stdout.strip(), APT_INSTALL_LOG_FILE_NAME)
+	except subprocess.CalledProcessError as e:
+		print(e.stderr.strip())
+		log(
+			f'Installing the APT packages failed: {e}\n{e.stdout.strip()}\n{e.stderr.strip()}',
+			APT_INSTALL_LOG_FILE_NAME,
+		)
+		return False
 
 	log('Basic APT packages installed', APT_INSTALL_LOG_FILE_NAME)
+	return True
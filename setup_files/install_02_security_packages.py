@@ -2,6 +2,8 @@ from .setup_utils import run_bash, log, get_setup_dir, get_conf_path
 
 SECURITY_INSTALL_LOG_FILE_NAME = 'install_02_security_packages.log'
 
+APT_DEPS = ['ufw', 'fail2ban']
+
 
 def install_security_packages(setup_scheme):
 	setup_dir = get_setup_dir()
@@ -12,8 +14,6 @@ def install_security_packages(setup_scheme):
 		mqtt_port = 8883
 
 	commands = [
-		# Install ufw
-		'apt install -y ufw',
 		# Configure ufw
 		'ufw allow ssh',
 		'ufw allow 80/tcp',  # for http
@@ -35,8 +35,7 @@ def install_security_packages(setup_scheme):
 		# Reload UFW to apply the new rules
     	'sudo ufw reload',
 
-		# Install fail2ban
-		'apt install -y fail2ban',
+		# Start fail2ban
 		'systemctl start fail2ban',
 		'systemctl enable fail2ban',
 		# Configure fail2ban
@@ -2,6 +2,9 @@ from .setup_utils import run_bash, log, get_linux_codename, get_linux_user, get_
 
 DOCKER_INSTALL_LOG_FILE_NAME = 'install_03_docker.log'
 
+# Needed to add Docker's APT repository; Docker itself is installed from that repository below
+APT_DEPS = ['ca-certificates', 'curl', 'gnupg']
+
 
 def install_docker():
 	"""
@@ -20,8 +23,6 @@ def install_docker():
 
 	commands = [
 		# Add Docker's official GPG key:
-		'sudo apt-get update',
-		'sudo apt-get install ca-certificates curl gnupg',
 		'sudo install -m 0755 -d /etc/apt/keyrings',
 		'curl -fsSL https://download.docker.com/linux/debian/gpg | sudo gpg --dearmor -o /etc/apt/keyrings/docker.gpg',
 		'sudo chmod a+r /etc/apt/keyrings/docker.gpg',
@@ -26,22 +26,20 @@ def install_influxdb(architecture):
 	influx_password = get_random_string(30)
 	influx_operator_token = get_random_string(50)
 
+	# Downloads, dpkg and the client install are separate commands (absolute paths, no cd), so only the
+	# dpkg step holds the apt lock (see run_bash) and parallel installers' apt calls don't wait for downloads
 	installation_commands_amd64 = [
-		# TODO Test: Ensure the temp directory exists and enter it
-		f'mkdir -p {influx_files_dir} && cd {influx_files_dir} && '  # works only with command-concatenat with &&
-		+
 		# Download and install InfluxDB
-		'curl -LO https://dl.influxdata.com/influxdb/releases/influxdb2_2.7.5-1_amd64.deb && '
-		+ 'sudo dpkg -i influxdb2_2.7.5-1_amd64.deb && '
-		+ 'sudo service influxdb start && '
-		+
+		f'mkdir -p {influx_files_dir} && '
+		+ f'curl -L -o {influx_files_dir}/influxdb2_2.7.5-1_amd64.deb '
+		+ 'https://dl.influxdata.com/influxdb/releases/influxdb2_2.7.5-1_amd64.deb',
+		f'sudo dpkg -i {influx_files_dir}/influxdb2_2.7.5-1_amd64.deb',
+		'sudo service influxdb start',
 		# Download and unpack the InfluxDB client, then move it
-		'wget https://dl.influxdata.com/influxdb/releases/influxdb2-client-2.7.3-linux-amd64.tar.gz && '
-		+ 'tar xvzf influxdb2-client-2.7.3-linux-amd64.tar.gz && '
-		+ 'sudo cp influx /usr/local/bin/ && '
-		+
-		# Return to install_dir
-		'cd -',
+		f'wget -P {influx_files_dir} '
+		+ 'https://dl.influxdata.com/influxdb/releases/influxdb2-client-2.7.3-linux-amd64.tar.gz && '
+		+ f'tar xvzf {influx_files_dir}/influxdb2-client-2.7.3-linux-amd64.tar.gz -C {influx_files_dir} && '
+		+ f'sudo cp {influx_files_dir}/influx /usr/local/bin/',
 		# Disables sending telemetry data to InfluxData
 		"echo 'reporting-disabled = true' | sudo tee -a /etc/influxdb/config.toml > /dev/null",
 		# To allow InfluxDB Node in Node-RED Container to accesss InfluxDB via the Docker network host address
@@ -49,21 +47,17 @@ def install_influxdb(architecture):
 	]
 
 	installation_commands_arm64 = [
-		# Ensure the temp directory exists and enter it
-		f'mkdir -p {influx_files_dir} && cd {influx_files_dir} && '
-		+
 		# Download and install InfluxDB
-		'curl -LO https://dl.influxdata.com/influxdb/releases/influxdb2_2.7.5-1_arm64.deb && '
-		+ 'sudo dpkg -i influxdb2_2.7.5-1_arm64.deb && '
-		+ 'sudo service influxdb start && '
-		+
+		f'mkdir -p {influx_files_dir} && '
+		+ f'curl -L -o {influx_files_dir}/influxdb2_2.7.5-1_arm64.deb '
+		+ 'https://dl.influxdata.com/influxdb/releases/influxdb2_2.7.5-1_arm64.deb',
+		f'sudo dpkg -i {influx_files_dir}/influxdb2_2.7.5-1_arm64.deb',
+		'sudo service influxdb start',
 		# Download and unpack the InfluxDB client (CLI), then move it
-		'wget https://dl.influxdata.com/influxdb/releases/influxdb2-client-2.7.3-linux-arm64.tar.gz && '
-		+ 'tar xvzf influxdb2-client-2.7.3-linux-arm64.tar.gz && '
-		+ 'cp influx /usr/local/bin/ && '
-		+
-		# Eeturn to install_dir
-		'cd -',
+		f'wget -P {influx_files_dir} '
+		+ 'https://dl.influxdata.com/influxdb/releases/influxdb2-client-2.7.3-linux-arm64.tar.gz && '
+		+ f'tar xvzf {influx_files_dir}/influxdb2-client-2.7.3-linux-arm64.tar.gz -C {influx_files_dir} && '
+		+ f'cp {influx_files_dir}/influx /usr/local/bin/',
 		# Disables sending telemetry data to InfluxData
 		"echo 'reporting-disabled = true' | sudo tee -a /etc/influxdb/config.toml > /dev/null",
 		# To allow InfluxDB Node in Node-RED Container to accesss InfluxDB via the Docker network host address
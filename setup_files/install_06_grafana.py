@@ -1,52 +1,112 @@
+import functools
+import http.client
 import os
-from .setup_utils import run_bash, log, get_setup_dir, get_conf_path
+import re
+import shutil
+import string
+import subprocess
+import urllib.request
+from pathlib import Path
+from .setup_utils import run_argv, log, get_setup_dir, get_conf_path, download, file_sha256, wait_port
 
 GRAFANA_INSTALL_LOG_FILE_NAME = 'install_06_grafana.log'
 
+APT_DEPS = ['adduser', 'libfontconfig1', 'musl']
 
-def install_grafana(architecture, setup_scheme, ip_address, domain, admin_email, admin_name, admin_pass):
+SETUP_DIR = get_setup_dir()
+CONF_DIR = get_conf_path()
+GRAFANA_FILES_DIR = f'{SETUP_DIR}/setup_files/tmp/grafana_install_files'
+GRAFANA_DOWNLOAD_URL = 'https://dl.grafana.com/oss/release'
+GRAFANA_VERSION = '10.4.2'
+# Debian architecture suffix of the Grafana package for each supported (uname/dpkg) architecture name
+GRAFANA_ARCH_SUFFIXES = {'amd64': 'amd64', 'x86_64': 'amd64', 'arm64': 'arm64', 'aarch64': 'arm64'}
+SHA256_HEX_PATTERN = re.compile(r'[0-9a-fA-F]{64}')
+
+
+def fetch_published_sha256(deb_url):
+    """
+    Return the SHA-256 that Grafana publishes next to each package (<url>.sha256),
+    or None if it cannot be fetched, in which case the package is installed unverified.
+    """
+    try:
+        with urllib.request.urlopen(f'{deb_url}.sha256', timeout=30) as response:
+            sha256 = response.read().decode().split()[0]
+    except (OSError, http.client.HTTPException, ValueError, IndexError) as e:  # URLError and timeouts are OSErrors
+        log(f'Could not fetch the SHA-256 of {deb_url}: {e!r}', GRAFANA_INSTALL_LOG_FILE_NAME)
+        return None
+    if not SHA256_HEX_PATTERN.fullmatch(sha256):
+        log(f'Ignoring invalid published SHA-256 of {deb_url}: {sha256[:80]!r}', GRAFANA_INSTALL_LOG_FILE_NAME)
+        return None
+    return sha256
+
+
+def download_grafana_deb(architecture):
+    """
+    Download the Grafana .deb package for the architecture and return its path. An already present
+    package is only reused if it matches the published SHA-256; otherwise it is downloaded again.
+    Can run in the background (see setup.py) so the download overlaps with the other installers.
+    """
+    deb_file_name = f'grafana_{GRAFANA_VERSION}_{GRAFANA_ARCH_SUFFIXES[architecture]}.deb'  # KeyError if unsupported
+    deb_url = f'{GRAFANA_DOWNLOAD_URL}/{deb_file_name}'
+    sha256 = fetch_published_sha256(deb_url)
+
+    os.makedirs(GRAFANA_FILES_DIR, exist_ok=True)
+    deb_file_path = f'{GRAFANA_FILES_DIR}/{deb_file_name}'
+    if os.path.exists(deb_file_path) and sha256 is not None and file_sha256(deb_file_path) == sha256.lower():
+        log(f'Using already downloaded {deb_file_path}', GRAFANA_INSTALL_LOG_FILE_NAME)
+    else:
+        download(deb_url, deb_file_path, sha256=sha256)
+    return deb_file_path
+
+
+@functools.lru_cache(maxsize=1)
+def _load_template():
+    """Read the grafana.ini template once per process."""
+    return Path(f'{CONF_DIR}/tmp.grafana.ini').read_text()
+
+
+def install_grafana(
+    architecture, setup_scheme, ip_address, domain, admin_email, admin_name, admin_pass, deb_future=None
+):
     """
     Install Grafana OSS (Open Source) Version based on the provided architecture and setup scheme.
+    `deb_future` is an optional future of a download_grafana_deb() call started earlier.
     Download pages:
         https://grafana.com/grafana/download?edition=oss&platform=linux
         https://grafana.com/grafana/download?edition=oss&platform=arm
     """
-    setup_dir = get_setup_dir()
-    conf_dir = get_conf_path()
-    grafana_files_dir = f'{setup_dir}/setup_files/tmp/grafana_install_files'
     host = "localhost"  # domain if setup_scheme == "TLS_DOMAIN" else ip_address
     port = 3000
 
-    installation_commands_amd64 = [
-        # Ensure the temp directory exists and enter it
-        f'mkdir -p {grafana_files_dir} && cd {grafana_files_dir} && '
-        'sudo apt-get install -y adduser libfontconfig1 musl && '
-        + 'wget https://dl.grafana.com/oss/release/grafana_10.4.2_amd64.deb && '
-        + 'sudo dpkg -i grafana_10.4.2_amd64.deb && '
-        + 'cd -',  # Return to install_dir
-    ]
-
-    installation_commands_arm64 = [
-        # Ensure the temp directory exists and enter it
-        f'mkdir -p {grafana_files_dir} && cd {grafana_files_dir} && '
-        'sudo apt-get install -y adduser libfontconfig1 musl && '
-        + 'wget https://dl.grafana.com/oss/release/grafana_10.4.2_arm64.deb && '
-        + 'sudo dpkg -i grafana_10.4.2_arm64.deb && '
-        + 'cd -',  # Return to install_dir
-    ]
+    config_data = {
+        'GRAFANA_HOST': host,
+        'GRAFANA_PORT': port,
+        'GRAFANA_ADMIN_USERNAME': admin_name,
+        'GRAFANA_ADMIN_PASSWORD': admin_pass,
+    }
 
-    if architecture in ['amd64', 'x86_64']:
-        installation_commands = installation_commands_amd64
-    elif architecture in ['arm64', 'aarch64']:
-        installation_commands = installation_commands_arm64
+    # Wait for the prefetched package (or download it now), then install it (apt resolves its dependencies)
+    try:
+        deb_file_path = deb_future.result() if deb_future is not None else download_grafana_deb(architecture)
+    except (OSError, http.client.HTTPException, ValueError, KeyError) as e:
+        # Skip Grafana rather than abort the other installers; the rest of the setup and config.toml still complete
+        msg = f'Could not download the Grafana package, Grafana is NOT installed: {e!r}'
+        print(msg)
+        log(msg, GRAFANA_INSTALL_LOG_FILE_NAME)
+        return config_data
 
-    for command in installation_commands:
-        output = run_bash(command)
-        log(output, GRAFANA_INSTALL_LOG_FILE_NAME)
+    try:
+        result = run_argv(['apt-get', 'install', '-y', deb_file_path], capture=True)
+        log(result.stdout.strip(), GRAFANA_INSTALL_LOG_FILE_NAME)
+        log(f'Installed {deb_file_path}', GRAFANA_INSTALL_LOG_FILE_NAME)
+    except subprocess.CalledProcessError as e:
+        log(
+            f'Error installing {deb_file_path}: {e}\n{e.stdout.strip()}\n{e.stderr.strip()}',
+            GRAFANA_INSTALL_LOG_FILE_NAME,
+        )
 
     try:
-        with open(f'{conf_dir}/tmp.grafana.ini', 'r') as file:
-            content = file.read()
+        template = _load_template()
 
         print("Replacing content with actual configuration.")
         log("Replacing content with actual configuration.", GRAFANA_INSTALL_LOG_FILE_NAME)
@@ -54,55 +114,57 @@ def install_grafana(architecture, setup_scheme, ip_address, domain, admin_email,
         log(f"Using host: {host}", GRAFANA_INSTALL_LOG_FILE_NAME)
         print(f"Using admin name: {admin_name}")
         log(f"Using admin name: {admin_name}", GRAFANA_INSTALL_LOG_FILE_NAME)
-        print(f"Using admin password: {admin_pass}")
-        log(f"Using admin password: {admin_pass}", GRAFANA_INSTALL_LOG_FILE_NAME)
-        print(f"Using admin email: {admin_email}")
-        log(f"Using admin email: {admin_email}", GRAFANA_INSTALL_LOG_FILE_NAME)
-
-        content = content.replace('DOMAIN_OR_IP', host)
-        content = content.replace('ADMIN_USERNAME', admin_name)
-        content = content.replace('ADMIN_PASSWORD', admin_pass)
-        content = content.replace('ADMIN_EMAIL', admin_email)
-
-        output_path = f'{setup_dir}/setup_files/tmp/grafana.ini'
-        with open(output_path, 'w') as file:
-            file.write(content)
+        log("Admin credentials templated into grafana.ini (values redacted)", GRAFANA_INSTALL_LOG_FILE_NAME)
+
+        # safe_substitute() keeps grafana's own $NONCE/$ROOT_PATH placeholders in the comments intact
+        content = string.Template(template).safe_substitute(
+            DOMAIN_OR_IP=host, ADMIN_USERNAME=admin_name, ADMIN_PASSWORD=admin_pass, ADMIN_EMAIL=admin_email
+        )
+
+        output_path = f'{SETUP_DIR}/setup_files/tmp/grafana.ini'
+        Path(output_path).write_text(content)
         log(f"File successfully created at: {output_path}", GRAFANA_INSTALL_LOG_FILE_NAME)
     except Exception as e:
         log(f"Error during file handling: {e}", GRAFANA_INSTALL_LOG_FILE_NAME)
 
-    run_bash('cp /etc/grafana/grafana.ini /etc/grafana/grafana.ini.backup')
-    # output = run_bash('cp {setup_dir}/setup_files/tmp/grafana.ini /etc/grafana/grafana.ini')
-    # log(output, GRAFANA_INSTALL_LOG_FILE_NAME)
-    source_file = f'{setup_dir}/setup_files/tmp/grafana.ini'
+    source_file = f'{SETUP_DIR}/setup_files/tmp/grafana.ini'
     destination_file = '/etc/grafana/grafana.ini'
 
+    try:
+        shutil.copyfile(destination_file, f'{destination_file}.backup')
+        log(f"Backed up {destination_file}", GRAFANA_INSTALL_LOG_FILE_NAME)
+    except OSError as e:
+        log(f"Error backing up {destination_file}: {e}", GRAFANA_INSTALL_LOG_FILE_NAME)
+
     log(f"Attempting to copy from {source_file} to {destination_file}", GRAFANA_INSTALL_LOG_FILE_NAME)
     if os.path.exists(source_file):
-        command = f'cp {source_file} {destination_file}'
-        output = run_bash(command)
-        log(f"Copy operation result: {output}", GRAFANA_INSTALL_LOG_FILE_NAME)
+        try:
+            shutil.copyfile(source_file, destination_file)
+            log("Copy operation successful", GRAFANA_INSTALL_LOG_FILE_NAME)
+        except OSError as e:
+            log(f"Copy operation failed: {e}", GRAFANA_INSTALL_LOG_FILE_NAME)
     else:
         log("Source file grafana.ini does not exist.", GRAFANA_INSTALL_LOG_FILE_NAME)
 
     commands = [
-        'systemctl daemon-reload',
-        'systemctl enable grafana-server',  # Configure grafana to start automatically
-        # Start grafana-server by executing
-        'systemctl start grafana-server',
+        ['systemctl', 'daemon-reload'],
+        ['systemctl', 'enable', 'grafana-server'],  # Configure grafana to start automatically
+        ['systemctl', 'start', 'grafana-server'],
     ]
 
-    for command in commands:
-        output = run_bash(command)
-        log(output, GRAFANA_INSTALL_LOG_FILE_NAME)
-    # output = run_bash('systemctl restart grafana-server')
-    # log(output, GRAFANA_INSTALL_LOG_FILE_NAME)
+    for argv in commands:
+        try:
+            run_argv(argv, capture=True)
+            log(f"{' '.join(argv)}: done", GRAFANA_INSTALL_LOG_FILE_NAME)
+        except subprocess.CalledProcessError as e:
+            log(f"{' '.join(argv)} failed:\n{e.stderr.strip()}", GRAFANA_INSTALL_LOG_FILE_NAME)
+
+    # Wait until grafana-server actually listens instead of assuming the start succeeded
+    if wait_port(port=port):
+        log(f'grafana-server is accepting connections on port {port}', GRAFANA_INSTALL_LOG_FILE_NAME)
+    else:
+        print(f'grafana-server did not open port {port} in time. See: journalctl -u grafana-server')
+        log(f'grafana-server did not open port {port} in time', GRAFANA_INSTALL_LOG_FILE_NAME)
 
-    config_data = {
-        'GRAFANA_HOST': host,
-        'GRAFANA_PORT': port,
-        'GRAFANA_ADMIN_USERNAME': admin_name,
-        'GRAFANA_ADMIN_PASSWORD': admin_pass,
-    }
     log('Grafana installation done', GRAFANA_INSTALL_LOG_FILE_NAME)
     return config_data
@@ -3,6 +3,8 @@ from .config import start_mosquitto_service_after_docker as mosquitto_after_dock
 
 MOSQUITTO_INSTALL_LOG_FILE_NAME = 'install_07_mosquitto.log'
 
+APT_DEPS = ['mosquitto', 'mosquitto-clients']
+
 
 def install_mosquitto(setup_scheme):
 	setup_dir = get_setup_dir()
@@ -18,10 +20,6 @@ def install_mosquitto(setup_scheme):
 	mqtt_out_to_db_user = 'mqtt_out-' + get_random_string(10)
 	mqtt_out_to_db_pw = get_random_string(50)
 
-	# Install mosquitto broker
-	output = run_bash('apt install -y mosquitto mosquitto-clients')
-	log(output, MOSQUITTO_INSTALL_LOG_FILE_NAME)
-
 	# Configure Mosquitto from template config files (for TLS or non-TLS)
 	dynsec_plugin_path = run_bash("whereis mosquitto_dynamic_security.so | awk '{print $2}'")
 
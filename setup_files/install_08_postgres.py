@@ -3,6 +3,8 @@ from .setup_utils import run_bash, log, get_random_string
 
 POSTGRESS_INSTALL_LOG_FILE_NAME = 'install_08_postgres.log'
 
+APT_DEPS = ['libpq-dev', 'postgresql', 'postgresql-contrib']
+
 
 def install_postgres():
 	"""
@@ -15,9 +17,6 @@ def install_postgres():
 	username = 'biomed-iot_user_' + get_random_string(10)
 	password = get_random_string(50)
 
-	output = run_bash('apt install -y libpq-dev postgresql postgresql-contrib')
-	log(output, POSTGRESS_INSTALL_LOG_FILE_NAME)
-
 	setup_commands = [
 		f'sudo -u postgres psql -c "CREATE DATABASE {db_name};"',
 		f'sudo -u postgres psql -c "CREATE USER {username} WITH PASSWORD \'{password}\';"',
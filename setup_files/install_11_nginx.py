@@ -3,6 +3,9 @@ from .setup_utils import run_bash, log, get_setup_dir, get_conf_path
 
 NGINX_INSTALL_LOG_FILE_NAME = 'install_11_nginx.log'
 
+# Nginx and Nginx stream module
+APT_DEPS = ['nginx', 'libnginx-mod-stream']
+
 
 def install_nginx(setup_scheme, domain, server_ip, hostname):
     """
@@ -11,10 +14,6 @@ def install_nginx(setup_scheme, domain, server_ip, hostname):
     setup_dir = get_setup_dir()
     config_path = get_conf_path()
 
-    # Install Nginx and Nginx stream module
-    nginx_install_output = run_bash('apt install -y nginx libnginx-mod-stream')
-    log(nginx_install_output, NGINX_INSTALL_LOG_FILE_NAME)
-
     commands = []
 
     if setup_scheme == 'TLS_WITH_DOMAIN':
@@ -1,22 +1,34 @@
 """Utility functions for the setup process"""
 
+import atexit
 import os
-import random
+import re
+import functools
+import hashlib
+import secrets
+import socket
 import string
 import subprocess
 import sys
+import threading
+import time
+import urllib.request
+from contextlib import nullcontext
 
 
+@functools.lru_cache(maxsize=None)
 def get_linux_user():
 	linux_user = os.getenv('SUDO_USER', default='')
 	return linux_user
 
 
+@functools.lru_cache(maxsize=None)
 def get_setup_dir():
 	setup_dir = f'/home/{get_linux_user()}/biomed-iot'
 	return setup_dir
 
 
+@functools.lru_cache(maxsize=None)
 def get_conf_path():
 	setup_dir = get_setup_dir()
 	conf_path = f'{setup_dir}/setup_files/config'
@@ -55,17 +67,59 @@ log_dir = os.path.join(get_setup_dir(), 'setup_files', 'setup_logs')
 os.makedirs(log_dir, exist_ok=True)
 
 
+# Open log files, kept open instead of reopened per message. Line-buffered, so every message is on disk
+# at once and the logs stay complete if setup is killed or the SSH session drops; closed at exit
+_log_files = {}
+_log_lock = threading.Lock()
+
+
 def log(message, log_file_name='main.log'):
-	log_file_path = os.path.join(log_dir, log_file_name)
-	with open(log_file_path, 'a') as file:
-		file.write(message + '\n')
+	with _log_lock:
+		log_file = _log_files.get(log_file_name)
+		if log_file is None:
+			log_file_path = os.path.join(log_dir, log_file_name)
+			log_file = _log_files[log_file_name] = open(log_file_path, 'a', buffering=1)
+		log_file.write(message + '\n')
+
+
+def _close_all_logs():
+	with _log_lock:
+		for log_file in _log_files.values():
+			log_file.close()
+		_log_files.clear()
+
+
+atexit.register(_close_all_logs)
+
+
+# apt and dpkg hold a system-wide lock, so their commands must not run in parallel installer threads.
+# Only matches apt/apt-get/dpkg in command position, not paths like /etc/apt/keyrings
+apt_lock = threading.Lock()
+APT_COMMAND_PATTERN = re.compile(r'(?:^|[;&|(]|\bsudo)\s*(?:apt|apt-get|dpkg)(?:\s|$)')
 
 
 def run_bash(command, show_output=True):
 	"""
 	Execute a Bash command, optionally print its output to the terminal,
 	and return its output or an error message.
+	Commands using apt or dpkg are serialized via apt_lock.
+	"""
+	with apt_lock if APT_COMMAND_PATTERN.search(command) else nullcontext():
+		return _run_bash(command, show_output)
+
+
+def run_argv(argv, capture=False):
 	"""
+	Run a command given as an argument list directly, without a bash process in between.
+	Raises subprocess.CalledProcessError if it fails. With capture=True its output is
+	captured into the returned CompletedProcess instead of going to the terminal.
+	Commands using apt or dpkg are serialized via apt_lock like in run_bash.
+	"""
+	with apt_lock if APT_COMMAND_PATTERN.search(argv[0]) else nullcontext():
+		return subprocess.run(argv, check=True, capture_output=capture, text=True)
+
+
+def _run_bash(command, show_output):
 	if show_output:
 		process = subprocess.Popen(
 			command,
@@ -97,6 +151,54 @@ def run_bash(command, show_output=True):
 			return f'Error executing command: {e.cmd}\nOutput:\n{e.stdout.strip()}\n'
 
 
+def download(url, dest, sha256=None):
+	"""
+	Stream the file at url into dest in 1 MiB chunks, without forking a download tool.
+	If sha256 is given, the bytes are hashed in the same pass and verified; on a mismatch
+	nothing is written to dest and a ValueError is raised.
+	The data is streamed into a temporary file first, so an existing dest is always complete.
+	"""
+	part_file = f'{dest}.part'
+	hasher = hashlib.sha256()
+	with urllib.request.urlopen(url, timeout=30) as response, open(part_file, 'wb') as file:
+		while chunk := response.read(1 << 20):
+			hasher.update(chunk)
+			file.write(chunk)
+
+	if sha256 is not None and hasher.hexdigest() != sha256.lower():
+		os.remove(part_file)
+		raise ValueError(f'SHA-256 mismatch for download of {url}')
+	os.replace(part_file, dest)
+	log(f'Downloaded {url} to {dest}')
+
+
+def file_sha256(path):
+	"""Return the SHA-256 hex digest of the file at path, read in 1 MiB chunks."""
+	hasher = hashlib.sha256()
+	with open(path, 'rb') as file:
+		while chunk := file.read(1 << 20):
+			hasher.update(chunk)
+	return hasher.hexdigest()
+
+
+def wait_port(host='127.0.0.1', port=80, timeout=30.0):
+	"""
+	Poll until a TCP connection to host:port succeeds, backing off from 0.05 s up to 0.5 s between attempts.
+	Returns True once the port accepts connections, False if the timeout expired first.
+	"""
+	deadline = time.monotonic() + timeout
+	delay = 0.05
+	while True:
+		try:
+			with socket.create_connection((host, port), timeout=0.5):
+				return True
+		except OSError:
+			if time.monotonic() + delay > deadline:
+				return False
+			time.sleep(delay)
+			delay = min(delay * 2, 0.5)
+
+
 def get_random_string(string_length, incl_symbols=False):
 	"""
 	Define the characters to include in the random string
@@ -107,8 +209,8 @@ def get_random_string(string_length, incl_symbols=False):
 	characters = string.ascii_letters + string.digits
 	if incl_symbols:
 		characters += symbols
-	# Generate a random string of the specified length
-	rand_str = ''.join(random.choice(characters) for _ in range(string_length))
+	# Generate a random string of the specified length from the OS CSPRNG
+	rand_str = ''.join(secrets.choice(characters) for _ in range(string_length))
 	return rand_str
 
 
@@ -1,3 +1,4 @@
+import os
 import re
 
 template = """
@@ -83,5 +84,8 @@ def write_config_file(specific_config_data):
 
 	content = template.format(**all_config_data)
 	destination = '/etc/biomed-iot/config.toml'
-	with open(destination, 'w') as config_file:
+	# Write to a temporary file and swap it in, so config.toml is never left half-written
+	tmp_destination = f'{destination}.tmp'
+	with open(tmp_destination, 'w') as config_file:
 		config_file.write(content)
+	os.replace(tmp_destination, destination)